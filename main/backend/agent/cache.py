@@ -0,0 +1,152 @@
+"""
+Semantic cache for RAG query results
+Matches repeated questions exactly by key, or paraphrases by embedding similarity
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+# Rows converted to float32 at a time when scanning the int8 matrix
+SCAN_BLOCK_ROWS = 64
+
+
+class SemanticCache:
+    """Thread-safe LRU cache with TTL, keyed by question and by question embedding"""
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        similarity_threshold: float = 0.97,
+        ttl_seconds: float = 3600
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Maximum number of cached results (least recently used are evicted)
+            similarity_threshold: Minimum cosine similarity for a paraphrase hit
+            ttl_seconds: Lifetime of a cached result
+        """
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (slot, result, expiry time), in LRU order
+        self._entries = OrderedDict()
+
+        # One int8 row per slot with its scale (symmetric per-vector quantization,
+        # a quarter of float32 memory); allocated on first put once the
+        # embedding size is known
+        self._vectors = None
+        self._scales = np.zeros(max_size, dtype=np.float32)
+        self._occupied = np.zeros(max_size, dtype=bool)
+        self._expiry = np.zeros(max_size)  # Per slot, time.monotonic() based
+
+        # Scan buffers, reused by every lookup (guarded by the lock)
+        self._block = None
+        self._scores = np.empty(max_size, dtype=np.float32)
+        self._slot_keys = [None] * max_size
+
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached result for an exact key, or None"""
+        with self._lock:
+            return self._get(key)
+
+    def get_similar(self, embedding: np.ndarray) -> Optional[Any]:
+        """
+        Return the cached result of the most similar earlier question
+
+        Args:
+            embedding: Normalized embedding of the incoming question
+
+        Returns:
+            Cached result if the best match clears the similarity threshold, else None
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+
+            # Block-wise matrix-vector product over every slot: int8 rows are
+            # converted into a small reused buffer rather than upcasting the
+            # whole matrix per lookup
+            embedding = np.asarray(embedding, dtype=np.float32)
+            scores = self._scores
+            for start in range(0, self.max_size, SCAN_BLOCK_ROWS):
+                rows = self._vectors[start:start + SCAN_BLOCK_ROWS]
+                block = self._block[:len(rows)]
+                np.copyto(block, rows, casting="unsafe")
+                np.dot(block, embedding, out=scores[start:start + len(rows)])
+            scores *= self._scales
+
+            # Free and expired slots never match
+            scores[~self._occupied | (self._expiry < time.monotonic())] = -np.inf
+            slot = int(np.argmax(scores))
+
+            if scores[slot] < self.similarity_threshold:
+                return None
+
+            return self._get(self._slot_keys[slot])
+
+    def put(self, key: Hashable, embedding: np.ndarray, result: Any):
+        """
+        Cache a result under its key and normalized question embedding
+
+        Args:
+            key: Exact-match key for the question
+            embedding: Normalized embedding of the question
+            result: Value to cache
+        """
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            elif len(self._entries) >= self.max_size:
+                self._evict(next(iter(self._entries)))  # Least recently used
+
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(embedding)), dtype=np.int8)
+                self._block = np.empty((SCAN_BLOCK_ROWS, len(embedding)), dtype=np.float32)
+
+            slot = int(np.argmin(self._occupied))  # First free slot
+            scale = float(np.max(np.abs(embedding))) / 127 or 1.0
+            self._vectors[slot] = np.round(embedding / scale)
+            self._scales[slot] = scale
+            self._occupied[slot] = True
+            self._slot_keys[slot] = key
+            expiry = time.monotonic() + self.ttl_seconds
+            self._expiry[slot] = expiry
+            self._entries[key] = (slot, result, expiry)
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._occupied[:] = False
+            self._slot_keys = [None] * self.max_size
+
+    def _get(self, key: Hashable) -> Optional[Any]:
+        """Exact lookup with expiry and LRU update; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry[2] < time.monotonic():
+            self._evict(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _evict(self, key: Hashable):
+        """Remove an entry and free its slot; caller holds the lock"""
+        slot = self._entries.pop(key)[0]
+        self._occupied[slot] = False
+        self._slot_keys[slot] = None
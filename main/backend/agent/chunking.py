@@ -0,0 +1,144 @@
+"""
+Chunking for F1 regulation pages
+Split-then-merge: fine-grained recursive split, then greedy merge of neighbours
+"""
+
+import re
+from typing import List, Tuple
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+
+
+class RegexCharacterTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    Recursive character splitter that packs chunks in a single forward scan
+
+    Separators keep their priority: each chunk ends at the last boundary of
+    the highest-priority separator that fits, like the recursive splitter,
+    but only the window of the chunk being built is ever searched instead of
+    re-splitting the whole text at every level and merging the pieces back.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._literals = [sep for sep in self._separators if sep]
+        # Any separator, used to find where the overlap of the next chunk starts
+        self._boundary_re = re.compile("|".join(map(re.escape, self._literals)))
+
+    def _split_text(self, text: str, separators: List[str]) -> List[str]:
+        # Packing below measures characters of literal separators; anything else
+        # uses the base splitter
+        if self._length_function is not len or self._is_separator_regex or not self._literals:
+            return super()._split_text(text, separators)
+
+        chunks = []
+        start = 0
+        while start < len(text):
+            limit = start + self._chunk_size
+            if limit >= len(text):
+                cut = len(text)
+            else:
+                # Last boundary of the best separator that fits, else a hard character cut
+                cut = limit
+                for sep in self._literals:
+                    i = text.rfind(sep, start, limit)
+                    if i >= start:
+                        cut = i + len(sep)
+                        break
+
+            chunk = text[start:cut].strip() if self._strip_whitespace else text[start:cut]
+            if chunk:
+                chunks.append(chunk)
+            if cut >= len(text):
+                break
+
+            # Start the next chunk just after the first boundary inside the overlap window
+            next_start = cut
+            if self._chunk_overlap:
+                match = self._boundary_re.search(text, max(cut - self._chunk_overlap, start + 1), cut)
+                if match and match.end() < cut:
+                    next_start = match.end()
+            start = next_start
+
+        return chunks
+
+
+class SplitThenMergeSplitter:
+    """Two-pass splitter producing uniformly sized chunks with no tiny fragments"""
+
+    def __init__(
+        self,
+        base_splitter: TextSplitter,
+        max_chunk_size: int = 1100,
+        min_chunk_size: int = 100
+    ):
+        """
+        Initialize the splitter
+
+        Args:
+            base_splitter: First-pass splitter, run with a target below max_chunk_size
+            max_chunk_size: Adjacent pieces are merged while the result stays within this size
+            min_chunk_size: Smaller chunks are folded into their neighbour even past max_chunk_size
+        """
+        self.base_splitter = base_splitter
+        self.max_chunk_size = max_chunk_size
+        self.min_chunk_size = min_chunk_size
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        Split each document and merge the pieces back up to the size budget
+
+        Args:
+            documents: Documents to split (one per PDF page)
+
+        Returns:
+            list: Chunks carrying their source document metadata plus start_index
+        """
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            for start, end in self._merge_spans(self._split_spans(text)):
+                chunks.append(Document(
+                    page_content=text[start:end],
+                    metadata={**doc.metadata, "start_index": start}
+                ))
+        return chunks
+
+    def _split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """First pass: (start, end) offsets of the base splitter's pieces in text"""
+        spans = []
+        search_from = 0
+        for piece in self.base_splitter.split_text(text):
+            # Pieces come in order and may overlap the previous one
+            start = text.find(piece, search_from)
+            if start == -1:
+                start = text.find(piece)
+            spans.append((start, start + len(piece)))
+            search_from = start + 1
+        return spans
+
+    def _merge_spans(self, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Second pass: greedily merge adjacent spans
+
+        Merging covers the source text from the first span's start to the last
+        span's end, so overlap between pieces is never duplicated.
+        """
+        merged = []
+        for start, end in spans:
+            if merged:
+                cur_start, cur_end = merged[-1]
+                fits = end - cur_start <= self.max_chunk_size
+                tiny = cur_end - cur_start < self.min_chunk_size
+                if fits or tiny:
+                    merged[-1] = (cur_start, max(cur_end, end))
+                    continue
+            merged.append((start, end))
+
+        # A tiny trailing chunk is folded into the one before it
+        if len(merged) > 1 and merged[-1][1] - merged[-1][0] < self.min_chunk_size:
+            tail_end = merged.pop()[1]
+            merged[-1] = (merged[-1][0], tail_end)
+
+        return merged
@@ -4,18 +4,84 @@ Handles PDF loading, chunking, embedding, and retrieval
 """
 
 import os
+import queue
+import asyncio
+import pickle
+import hashlib
 import logging
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 from pathlib import Path
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import faiss
+import httpx
+import numpy as np
+import openai
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from agent.cache import SemanticCache
+from agent.chunking import RegexCharacterTextSplitter, SplitThenMergeSplitter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Chunking settings (characters)
+# Pages are split fine-grained first, then adjacent pieces are merged
+CHUNK_SIZE = 600  # First-pass target
+CHUNK_OVERLAP = 100  # Overlap to maintain context
+MAX_CHUNK_SIZE = 1100  # Merge budget, ~275 words per chunk
+MIN_CHUNK_SIZE = 100  # Smaller fragments are folded into a neighbour
+
+# Split chunks are cached here, keyed by PDF content hash and chunking settings
+CHUNK_CACHE_DIR = "./cache"
+CHUNK_CACHE_VERSION = 2  # Bump when the chunking algorithm changes
+
+# Embedding vectors are cached here, keyed by model and text hash
+EMBEDDING_CACHE_DIR = "./cache/embeddings"
+
+# FAISS index persisted here
+VECTORSTORE_DIR = "./faiss_db"
+
+# Number of chunks sent to the embeddings API per request
+EMBED_BATCH_SIZE = 256
+MAX_PENDING_BATCHES = 2  # Parsing pauses when this many batches await embedding
+
+# Retrieval settings
+# MMR picks 4 diverse chunks from the 20 nearest, so one article isn't returned 4 times
+RETRIEVAL_KWARGS = {"k": 4, "fetch_k": 20, "lambda_mult": 0.5}
+MIN_RELEVANCE_SCORE = 0.75  # Cosine similarity; weaker chunks are not sent to the LLM
+MAX_CONTEXT_CHARS = 3200  # ~800 tokens of context per question, best chunks first
+
+# Query result cache settings
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_TTL = 3600  # Seconds
+NEAR_DUPLICATE_THRESHOLD = 0.97  # Cosine similarity to reuse a cached result
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # In-memory query embeddings, in front of the disk cache
+
+# Multi-query retrieval: reciprocal rank fusion constant and merged result size
+RRF_K = 60
+MAX_MERGED_SOURCES = 8
+MAX_MERGED_CONTEXT_CHARS = 6400
+
+# Failures of the embeddings API (network or OpenAI errors) that are handled
+# rather than propagated
+EMBEDDINGS_API_ERRORS = (httpx.HTTPError, openai.APIError)
+
+# Framing around retrieved context handed to the voice agent
+_AGENT_CONTEXT_HEADER = "\nBased on the FIA F1 Regulations, here is the relevant information:\n"
+_AGENT_CONTEXT_FOOTER = (
+    "\nUse this information to answer the user's question accurately, "
+    "citing specific articles when possible.\n"
+)
+
 
 class F1TechnicalRAG:
     """RAG system for F1 Sporting/Technical Regulations"""
@@ -28,10 +94,42 @@ class F1TechnicalRAG:
             pdf_path: Path to the F1 regulations PDF
         """
         self.pdf_path = pdf_path
-        self.embeddings = OpenAIEmbeddings()
+        
+        # One long-lived HTTP/2 connection pool for every embedding request, so
+        # the TLS handshake is paid once rather than per batch
+        self._http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+            timeout=60.0
+        )
+        self._openai_embeddings = OpenAIEmbeddings(
+            http_client=self._http_client,
+            chunk_size=EMBED_BATCH_SIZE  # Inputs per request, matching our batches
+        )
+        
+        # Document and query embeddings are memoized on disk across restarts
+        self.embeddings = CacheBackedEmbeddings.from_bytes_store(
+            self._openai_embeddings,
+            LocalFileStore(EMBEDDING_CACHE_DIR),
+            namespace=self._openai_embeddings.model,
+            query_embedding_cache=True,
+            key_encoder="blake2b"
+        )
         self.vectorstore = None
         self.retriever = None
         
+        # Results for recent questions, matched exactly or by paraphrase
+        self._query_cache = SemanticCache(
+            max_size=QUERY_CACHE_SIZE,
+            similarity_threshold=NEAR_DUPLICATE_THRESHOLD,
+            ttl_seconds=QUERY_CACHE_TTL
+        )
+        
+        # Normalized embeddings of recent questions by cache key, in LRU order;
+        # outlive cached results, so repeats after expiry skip the embeddings API
+        self._query_embeddings = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
+        
         # Check if PDF exists
         if not Path(pdf_path).exists():
             logger.error(f"PDF not found at {pdf_path}")
@@ -44,44 +142,197 @@ class F1TechnicalRAG:
     
     def load_and_process_pdf(self):
         """Load PDF, split into chunks, and create embeddings"""
-        logger.info("Loading PDF...")
+        # Split into chunks
+        text_splitter = SplitThenMergeSplitter(
+            RegexCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
+                length_function=len,
+                separators=["\n\n", "\n", ". ", " ", ""]
+            ),
+            max_chunk_size=MAX_CHUNK_SIZE,
+            min_chunk_size=MIN_CHUNK_SIZE
+        )
         
-        # Load PDF
-        loader = PyPDFLoader(self.pdf_path)
-        documents = loader.load()
+        # Create vector store (built once every chunk is embedded)
+        logger.info("Creating embeddings and vector store (this may take a minute)...")
+        self.vectorstore = None
         
-        logger.info(f"Loaded {len(documents)} pages from PDF")
+        # Produce chunks on this thread while a worker thread embeds finished
+        # batches, so PDF parsing overlaps with embedding requests
+        # The bounded queue keeps at most a few batches in memory ahead of the
+        # embedding requests
+        batches = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            consumer = executor.submit(self._embed_batches, batches)
+            
+            buffer = []
+            try:
+                for chunk in self._iter_chunks(text_splitter):
+                    buffer.append(chunk)
+                    if len(buffer) >= EMBED_BATCH_SIZE:
+                        if not self._put_batch(batches, buffer, consumer):
+                            break  # Embedding failed; its error is raised below
+                        buffer = []
+                else:
+                    if buffer:
+                        self._put_batch(batches, buffer, consumer)
+            finally:
+                # Tell the consumer no more batches are coming
+                self._put_batch(batches, None, consumer)
+            
+            num_chunks = consumer.result()
         
-        # Split into chunks
-        # Using smaller chunks for more precise retrieval
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,  # ~250 words per chunk
-            chunk_overlap=200,  # Overlap to maintain context
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        if self.vectorstore is None:
+            raise ValueError(f"No text could be extracted from {self.pdf_path}")
         
-        chunks = text_splitter.split_documents(documents)
-        logger.info(f"Split into {len(chunks)} chunks")
+        self.vectorstore.save_local(VECTORSTORE_DIR)  # Persist to disk
+        logger.info(f"Vector store built from {num_chunks} chunks")
         
-        # Create vector store
-        logger.info("Creating embeddings and vector store (this may take a minute)...")
-        self.vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            persist_directory="./chroma_db"  # Persist to disk
-        )
+        # Cached results refer to the previous index
+        self._query_cache.clear()
         
         # Create retriever
         self.retriever = self.vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 4}  # Retrieve top 4 most relevant chunks
+            search_type="mmr",
+            search_kwargs=RETRIEVAL_KWARGS
         )
         
         logger.info("RAG pipeline initialized successfully!")
         
         return self
     
+    def _chunk_cache_path(self) -> Path:
+        """Path of the chunk cache for the current PDF contents and chunking settings"""
+        file_hash = hashlib.blake2b(Path(self.pdf_path).read_bytes()).hexdigest()[:16]
+        return Path(CHUNK_CACHE_DIR) / (
+            f"chunks_v{CHUNK_CACHE_VERSION}_{file_hash}_"
+            f"{CHUNK_SIZE}_{CHUNK_OVERLAP}_{MAX_CHUNK_SIZE}_{MIN_CHUNK_SIZE}.pkl"
+        )
+    
+    def _iter_chunks(self, text_splitter: SplitThenMergeSplitter):
+        """
+        Yield document chunks, reusing the on-disk chunk cache when possible
+        
+        On a cache miss the PDF is streamed page by page and the resulting
+        chunks are written to the cache once the generator is exhausted.
+        
+        Args:
+            text_splitter: Splitter used when the PDF has to be parsed
+        """
+        cache_path = self._chunk_cache_path()
+        if cache_path.exists():
+            logger.info(f"Loading cached chunks from {cache_path}")
+            with open(cache_path, "rb") as f:
+                yield from pickle.load(f)
+            return
+        
+        logger.info("Loading PDF...")
+        loader = PyPDFLoader(self.pdf_path)
+        
+        chunks = []
+        num_pages = 0
+        for page in loader.lazy_load():
+            num_pages += 1
+            page_chunks = text_splitter.split_documents([page])
+            chunks.extend(page_chunks)
+            yield from page_chunks
+        
+        logger.info(f"Split {num_pages} pages into {len(chunks)} chunks")
+        
+        # Write to a temporary file first so an interrupted run never leaves a partial cache
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")  # Per process, never shared
+        with open(tmp_path, "wb") as f:
+            pickle.dump(chunks, f)
+        tmp_path.replace(cache_path)
+    
+    @staticmethod
+    def _put_batch(batches: queue.Queue, batch, consumer) -> bool:
+        """
+        Hand a batch to the embedding worker, waiting while the queue is full
+        
+        Args:
+            batches: Queue read by the worker
+            batch: Chunk list, or None to signal the end of input
+            consumer: Future of the worker
+            
+        Returns:
+            bool: False if the worker has stopped (its future holds the error)
+        """
+        while not consumer.done():
+            try:
+                batches.put(batch, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _embed_batches(self, batches: queue.Queue) -> int:
+        """
+        Consume chunk batches, then build the vector store from all of them
+        
+        Embeddings are held until the input ends so the quantizer is trained
+        on the whole document, not just its first pages.
+        
+        Args:
+            batches: Queue of chunk lists, terminated by None
+            
+        Returns:
+            int: Number of chunks embedded
+        """
+        texts = []
+        metadatas = []
+        vectors = []
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            
+            # One embeddings API round-trip per batch
+            batch_texts = [chunk.page_content for chunk in batch]
+            vectors.extend(self.embeddings.embed_documents(batch_texts))
+            texts.extend(batch_texts)
+            metadatas.extend(chunk.metadata for chunk in batch)
+            logger.info(f"Embedded {len(texts)} chunks")
+        
+        if texts:
+            self.vectorstore = self._create_vectorstore(vectors)
+            self.vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas)
+        
+        return len(texts)
+    
+    def _create_vectorstore(self, training_vectors: List[List[float]]) -> FAISS:
+        """
+        Create an empty int8 scalar-quantized FAISS store
+        
+        Vectors are stored as 8-bit codes (4x smaller than float32). The
+        per-dimension quantization ranges are trained on every chunk that will
+        be added, so no stored vector is clipped. Embeddings are unit length,
+        so inner product is cosine similarity.
+        
+        Args:
+            training_vectors: Embeddings used to train the quantizer
+            
+        Returns:
+            FAISS: Empty vector store ready for add_embeddings
+        """
+        training = np.asarray(training_vectors, dtype=np.float32)
+        index = faiss.IndexScalarQuantizer(
+            training.shape[1],
+            faiss.ScalarQuantizer.QT_8bit,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(training)
+        
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+    
     def query(self, question: str) -> Dict[str, any]:
         """
         Query the regulations
@@ -95,26 +346,210 @@ class F1TechnicalRAG:
         if not self.retriever:
             raise ValueError("RAG pipeline not initialized. Call load_and_process_pdf() first.")
         
+        # Exact repeat of a recent question
+        key = self._cache_key(question)
+        result = self._query_cache.get(key)
+        if result is not None:
+            logger.info(f"Query cache hit: {question}")
+            return result
+        
         logger.info(f"Querying: {question}")
         
-        # Retrieve relevant documents
-        relevant_docs = self.retriever.get_relevant_documents(question)
+        (query_embedding,) = self._embed_queries([key], [question])
+        return self._query_by_vector(key, question, query_embedding)
+    
+    def _query_by_vector(self, key: bytes, question: str, query_embedding: np.ndarray) -> Dict[str, any]:
+        """
+        Answer an embedded question from near-duplicates or the index, and cache the result
+        
+        Args:
+            key: Cache key of the question
+            question: The question (for logging)
+            query_embedding: Normalized question embedding, used for both the
+                near-duplicate check and the search
+            
+        Returns:
+            dict: Same shape as query()
+        """
+        result = self._query_cache.get_similar(query_embedding)
+        if result is not None:
+            logger.info(f"Query cache hit (near-duplicate): {question}")
+        else:
+            # Retrieve relevant documents, dropping weak matches
+            docs_and_scores = self.vectorstore.max_marginal_relevance_search_with_score_by_vector(
+                query_embedding.tolist(),
+                **self.retriever.search_kwargs
+            )
+            relevant_docs = [doc for doc, score in docs_and_scores if score >= MIN_RELEVANCE_SCORE]
+            top_score = float(max((score for _, score in docs_and_scores), default=0.0))
+            
+            logger.info(f"Retrieved {len(relevant_docs)} relevant chunks (top score {top_score:.2f})")
+            
+            result = self._build_result(relevant_docs, top_score, MAX_CONTEXT_CHARS)
+        
+        self._query_cache.put(key, query_embedding, result)
+        
+        return result
+    
+    async def query_batch(self, questions: List[str]) -> Dict[str, any]:
+        """
+        Query the regulations for several sub-questions concurrently
+        
+        Sub-questions not answered from the cache are embedded in a single
+        request, then each is retrieved on its own worker thread. Results are
+        deduplicated and merged with reciprocal rank fusion.
+        
+        Args:
+            questions: Sub-questions making up a compound question
+            
+        Returns:
+            dict: Merged context and source documents, same shape as query()
+        """
+        if not self.retriever:
+            raise ValueError("RAG pipeline not initialized. Call load_and_process_pdf() first.")
+        
+        # Repeated sub-questions (same cache key) are retrieved and fused once
+        unique = {}
+        for question in questions:
+            unique.setdefault(self._cache_key(question), question)
+        keys = list(unique)
+        questions = list(unique.values())
+        
+        if not questions:
+            return self._build_result([], 0.0, MAX_MERGED_CONTEXT_CHARS)
+        
+        results = [self._query_cache.get(key) for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+        
+        if misses:
+            logger.info(f"Querying: {[questions[i] for i in misses]}")
+            query_embeddings = await asyncio.to_thread(
+                self._embed_queries, [keys[i] for i in misses], [questions[i] for i in misses]
+            )
+            searched = await asyncio.gather(*(
+                asyncio.to_thread(self._query_by_vector, keys[i], questions[i], query_embedding)
+                for i, query_embedding in zip(misses, query_embeddings)
+            ))
+            for i, result in zip(misses, searched):
+                results[i] = result
+        
+        # Reciprocal rank fusion over (page, content prefix) identities
+        scores = {}
+        docs = {}
+        for result in results:
+            for rank, doc in enumerate(result["sources"]):
+                doc_key = (doc.metadata.get("page"), doc.page_content[:64])
+                scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (RRF_K + rank + 1)
+                docs.setdefault(doc_key, doc)
+        
+        ranked = sorted(scores, key=scores.get, reverse=True)[:MAX_MERGED_SOURCES]
+        logger.info(f"Merged {len(ranked)} chunks for {len(questions)} sub-questions")
+        
+        return self._build_result(
+            [docs[doc_key] for doc_key in ranked],
+            max(result["top_score"] for result in results),
+            MAX_MERGED_CONTEXT_CHARS
+        )
+    
+    @staticmethod
+    def _build_result(relevant_docs: List, top_score: float, max_chars: int) -> Dict[str, any]:
+        """
+        Format retrieved documents into a query result
+        
+        Args:
+            relevant_docs: Documents, best first
+            top_score: Best similarity score seen by the retrieval
+            max_chars: Context budget; documents past it are dropped (the
+                first is always kept)
+        """
+        kept = []
+        total_chars = 0
+        for doc in relevant_docs:
+            total_chars += len(doc.page_content)
+            if kept and total_chars > max_chars:
+                break
+            kept.append(doc)
         
-        # Format context from retrieved documents
         context = "\n\n".join([
             f"[Source: Page {doc.metadata.get('page', 'unknown')}]\n{doc.page_content}"
-            for doc in relevant_docs
+            for doc in kept
         ])
         
-        logger.info(f"Retrieved {len(relevant_docs)} relevant chunks")
-        
         return {
             "context": context,
-            "sources": relevant_docs,
-            "num_sources": len(relevant_docs)
+            "sources": kept,
+            "num_sources": len(kept),
+            "top_score": top_score
         }
     
-    def get_context_for_agent(self, question: str) -> str:
+    def _embed_queries(self, keys: List[bytes], questions: List[str]) -> List[np.ndarray]:
+        """
+        Normalized embeddings of questions, memoized in memory by cache key
+        
+        Questions missing from memory are embedded together in one request.
+        
+        Args:
+            keys: Cache keys of the questions (see _cache_key)
+            questions: Questions to embed on a miss
+            
+        Returns:
+            list: Read-only unit-length float32 vectors, in input order
+        """
+        with self._query_embeddings_lock:
+            embeddings = [self._query_embeddings.get(key) for key in keys]
+            for key, embedding in zip(keys, embeddings):
+                if embedding is not None:
+                    self._query_embeddings.move_to_end(key)
+        
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not misses:
+            return embeddings
+        
+        # Same disk cache entries as embed_query, so single and batched
+        # lookups of a question share them
+        vectors = np.asarray(
+            self.embeddings.embed_documents([questions[i] for i in misses]),
+            dtype=np.float32
+        )
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors.setflags(write=False)  # Rows are shared between callers
+        
+        with self._query_embeddings_lock:
+            for i, vector in zip(misses, vectors):
+                embeddings[i] = vector
+                self._query_embeddings[keys[i]] = vector
+            while len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        
+        return embeddings
+    
+    @staticmethod
+    def _cache_key(question: str) -> bytes:
+        """Hash a question after normalizing case and surrounding whitespace"""
+        return hashlib.blake2b(question.strip().lower().encode(), digest_size=16).digest()
+    
+    def warm_up(self):
+        """
+        Pay first-query costs at startup instead of on the user's first question
+        
+        Opens the embeddings API connection (bypassing the embedding cache so
+        a real request is made) and runs one search to page in the index.
+        """
+        if not self.retriever:
+            raise ValueError("RAG pipeline not initialized. Call load_and_process_pdf() first.")
+        
+        # Best effort: an API failure here must not stop startup, the first
+        # real query will retry and report it; anything else is a bug
+        try:
+            vector = self._openai_embeddings.embed_query("warmup")
+        except EMBEDDINGS_API_ERRORS as e:
+            logger.warning(f"Embeddings API warm-up failed: {e}")
+            return
+        
+        self.vectorstore.similarity_search_by_vector(vector, k=1)
+        logger.info("RAG pipeline warmed up")
+    
+    def get_context_for_agent(self, question: str) -> Optional[str]:
         """
         Get formatted context for the voice agent
         
@@ -122,35 +557,76 @@ class F1TechnicalRAG:
             question: User's question
             
         Returns:
-            str: Formatted context string ready for LLM
+            str: Formatted context string ready for LLM, or None if the
+                regulations could not be searched (the error is logged)
         """
+        # Only embedding API failures are expected here; anything else is a bug
+        # and should propagate
         try:
             result = self.query(question)
+        except EMBEDDINGS_API_ERRORS:
+            logger.exception("Error retrieving context")
+            return None
+        
+        return self._format_for_agent(result)
+    
+    async def get_context_for_agent_batch(self, questions: List[str]) -> Optional[str]:
+        """
+        Get formatted context for a compound question split into sub-questions
+        
+        Args:
+            questions: Sub-questions to retrieve concurrently
             
-            if result["num_sources"] == 0:
-                return "No relevant information found in the regulations."
-            
-            # Format for agent consumption
-            formatted_context = f"""
-Based on the FIA F1 Regulations, here is the relevant information:
+        Returns:
+            str: Formatted context string ready for LLM, or None if the
+                regulations could not be searched (the error is logged)
+        """
+        try:
+            result = await self.query_batch(questions)
+        except EMBEDDINGS_API_ERRORS:
+            logger.exception("Error retrieving context")
+            return None
+        
+        return self._format_for_agent(result)
+    
+    @staticmethod
+    def _format_for_agent(result: Dict[str, any]) -> str:
+        """Wrap a query result in the framing handed to the voice agent"""
+        if result["num_sources"] == 0:
+            return "No relevant information found in the regulations."
+        
+        # Format for agent consumption
+        return "\n".join((_AGENT_CONTEXT_HEADER, result["context"], _AGENT_CONTEXT_FOOTER))
 
-{result['context']}
 
-Use this information to answer the user's question accurately, citing specific articles when possible.
-"""
-            return formatted_context
-            
-        except Exception as e:
-            logger.error(f"Error retrieving context: {e}")
-            return f"Error accessing regulations: {str(e)}"
+def build_vectorstore(pdf_path: str = "data/fia2026.pdf"):
+    """
+    Build and save the vector store if it doesn't exist yet
+    
+    Meant to run once, in a single process, before any process loads the
+    pipeline with build_if_missing=False.
+    
+    Args:
+        pdf_path: Path to F1 regulations PDF
+    """
+    if Path(VECTORSTORE_DIR).exists():
+        return
+    
+    logger.info("Creating new vector store...")
+    F1TechnicalRAG(pdf_path).load_and_process_pdf()
 
 
-def initialize_rag_pipeline(pdf_path: str = "data/fia2026.pdf") -> F1TechnicalRAG:
+def initialize_rag_pipeline(
+    pdf_path: str = "data/fia2026.pdf",
+    build_if_missing: bool = True
+) -> F1TechnicalRAG:
     """
     Initialize and return the RAG pipeline (called once at startup)
     
     Args:
         pdf_path: Path to F1 regulations PDF
+        build_if_missing: Build the vector store when none is saved; when
+            False a missing store raises FileNotFoundError instead
         
     Returns:
         F1TechnicalRAG: Initialized RAG pipeline
@@ -158,20 +634,28 @@ def initialize_rag_pipeline(pdf_path: str = "data/fia2026.pdf") -> F1TechnicalRA
     rag = F1TechnicalRAG(pdf_path)
     
     # Check if vector store already exists
-    if Path("./chroma_db").exists():
+    if Path(VECTORSTORE_DIR).exists():
         logger.info("Loading existing vector store...")
-        rag.vectorstore = Chroma(
-            persist_directory="./chroma_db",
-            embedding_function=rag.embeddings
+        rag.vectorstore = FAISS.load_local(
+            VECTORSTORE_DIR,
+            rag.embeddings,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            allow_dangerous_deserialization=True  # Index is written by this pipeline
         )
         rag.retriever = rag.vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 4}
+            search_type="mmr",
+            search_kwargs=RETRIEVAL_KWARGS
         )
         logger.info("Vector store loaded from disk!")
-    else:
+    elif build_if_missing:
         logger.info("Creating new vector store...")
         rag.load_and_process_pdf()
+    else:
+        raise FileNotFoundError(
+            f"No vector store at {VECTORSTORE_DIR}; build it with build_vectorstore() first"
+        )
+    
+    rag.warm_up()
     
     return rag
 
@@ -3,25 +3,74 @@ F1 Race Engineer Tools - Championship Calculator
 Pure math tool that combines perfectly with RAG
 """
 
+from functools import lru_cache, wraps
+from types import MappingProxyType
 from typing import Dict, List, Optional
 
+import numpy as np
+
+# Results of the pure calculators are memoized, since follow-up questions
+# often repeat the same arguments
+RESULT_CACHE_SIZE = 256
+
+
+def _freeze(value):
+    """Read-only copy of a result: dicts become mapping proxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _memoized(fn):
+    """
+    LRU-cache a calculator returning a dict
+    
+    The cached result is frozen; each caller gets its own top-level dict,
+    and nested values are read-only, so no caller can alter a later answer.
+    """
+    @lru_cache(maxsize=RESULT_CACHE_SIZE)
+    def cached(*args, **kwargs):
+        return _freeze(fn(*args, **kwargs))
+    
+    @wraps(fn)
+    def wrapper(*args, **kwargs) -> Dict:
+        return dict(cached(*args, **kwargs))
+    
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
 
 class F1Tools:
     """Tools for F1 championship calculations and strategy"""
     
-    RACE_POINTS = {
-        1: 25, 2: 18, 3: 15, 4: 12, 5: 10,
-        6: 8, 7: 6, 8: 4, 9: 2, 10: 1
-    }
+    MAX_POSITION = 20
+    
+    # Points indexed by finishing position (index 0 unused, positions 1-20)
+    RACE_POINTS = (
+        0, 25, 18, 15, 12, 10,
+        8, 6, 4, 2, 1
+    ) + (0,) * 10
     
-    SPRINT_POINTS = {
-        1: 8, 2: 7, 3: 6, 4: 5, 5: 4,
-        6: 3, 7: 2, 8: 1
-    }
+    SPRINT_POINTS = (
+        0, 8, 7, 6, 5, 4,
+        3, 2, 1
+    ) + (0,) * 12
     
     FASTEST_LAP_POINTS = 1
     
+    # Speed conversions, precomputed so pit stop calculations multiply instead of divide
+    KMH_TO_MS = 1.0 / 3.6
+    RACING_SPEED_MS = 200 * KMH_TO_MS  # Assumed average racing speed of ~200 km/h
+    INV_RACING_SPEED_MS = 1.0 / RACING_SPEED_MS
+    
+    # Array copy of the race points table for vectorized lookups
+    _RACE_POINTS_ARR = np.array(RACE_POINTS, dtype=np.int8)
+    
     @staticmethod
+    @_memoized
     def calculate_championship_scenario(
         driver1_points: int,
         driver2_points: int,
@@ -106,6 +155,60 @@ class F1Tools:
             }
         }
     
+    @staticmethod
+    def calculate_championship_scenarios_batch(
+        driver1_points: int,
+        driver2_points: int,
+        positions_driver1: np.ndarray,
+        positions_driver2: np.ndarray,
+        fastest_lap_driver1: Optional[np.ndarray] = None,
+        fastest_lap_driver2: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        Evaluate many remaining-season outcomes between two drivers at once
+        
+        Args:
+            driver1_points: Current points for driver 1
+            driver2_points: Current points for driver 2
+            positions_driver1: Finishing positions for driver 1, shape (scenarios, races)
+            positions_driver2: Finishing positions for driver 2, shape (scenarios, races)
+            fastest_lap_driver1: Optional boolean fastest lap flags for driver 1, same shape
+            fastest_lap_driver2: Optional boolean fastest lap flags for driver 2, same shape
+            
+        Returns:
+            dict: Final totals per scenario and boolean masks of who finishes ahead
+        """
+        positions_driver1 = np.asarray(positions_driver1)
+        positions_driver2 = np.asarray(positions_driver2)
+        
+        def season_points(positions, fastest_lap):
+            # Out-of-range positions map to an index that scores 0
+            valid = (positions >= 1) & (positions <= F1Tools.MAX_POSITION)
+            pts = F1Tools._RACE_POINTS_ARR[np.where(valid, positions, 0)].astype(np.int32)
+            
+            # Fastest lap point only if finishing in top 10
+            if fastest_lap is not None:
+                pts += (np.asarray(fastest_lap, dtype=bool) & valid & (positions <= 10)) * F1Tools.FASTEST_LAP_POINTS
+            
+            return pts.sum(axis=-1)
+        
+        driver1_totals = driver1_points + season_points(positions_driver1, fastest_lap_driver1)
+        driver2_totals = driver2_points + season_points(positions_driver2, fastest_lap_driver2)
+        
+        driver1_ahead = driver1_totals > driver2_totals
+        driver2_ahead = driver2_totals > driver1_totals
+        
+        return {
+            "driver1_totals": driver1_totals,
+            "driver2_totals": driver2_totals,
+            "driver1_ahead": driver1_ahead,
+            "driver2_ahead": driver2_ahead,
+            "tied": ~(driver1_ahead | driver2_ahead),
+            "num_scenarios": int(driver1_totals.size),
+            "driver1_ahead_count": int(driver1_ahead.sum()),
+            "driver2_ahead_count": int(driver2_ahead.sum())
+        }
+    
     @staticmethod
     def calculate_race_points(
         position: int,
@@ -123,10 +226,13 @@ class F1Tools:
         Returns:
             int: Points scored
         """
+        if not 1 <= position <= F1Tools.MAX_POSITION:
+            return 0
+        
         if is_sprint:
-            return F1Tools.SPRINT_POINTS.get(position, 0)
+            return F1Tools.SPRINT_POINTS[position]
         
-        points = F1Tools.RACE_POINTS.get(position, 0)
+        points = F1Tools.RACE_POINTS[position]
         
         # Fastest lap point only if finishing in top 10
         if has_fastest_lap and position <= 10:
@@ -135,6 +241,7 @@ class F1Tools:
         return points
     
     @staticmethod
+    @_memoized
     def calculate_points_swing(
         driver1_position: int,
         driver2_position: int,
@@ -166,6 +273,7 @@ class F1Tools:
         }
     
     @staticmethod
+    @_memoized
     def calculate_pit_stop_time_loss(
         pit_lane_length_meters: float,
         pit_lane_speed_limit_kmh: int,
@@ -183,7 +291,7 @@ class F1Tools:
             dict: Breakdown of pit stop time loss
         """
         # Convert speed to m/s
-        speed_ms = pit_lane_speed_limit_kmh / 3.6
+        speed_ms = pit_lane_speed_limit_kmh * F1Tools.KMH_TO_MS
         
         # Time spent in pit lane
         pit_lane_time = pit_lane_length_meters / speed_ms
@@ -192,8 +300,7 @@ class F1Tools:
         total_time = pit_lane_time + tire_change_seconds
         
         # Time lost vs staying out (assuming racing speed of ~200 km/h average)
-        racing_speed_ms = 200 / 3.6
-        time_if_racing = pit_lane_length_meters / racing_speed_ms
+        time_if_racing = pit_lane_length_meters * F1Tools.INV_RACING_SPEED_MS
         time_loss = total_time - time_if_racing
         
         return {
@@ -204,6 +311,6 @@ class F1Tools:
             "details": {
                 "pit_lane_length_m": pit_lane_length_meters,
                 "speed_limit_kmh": pit_lane_speed_limit_kmh,
-                "equivalent_distance_lost_m": round(time_loss * racing_speed_ms, 0)
+                "equivalent_distance_lost_m": round(time_loss * F1Tools.RACING_SPEED_MS, 0)
             }
         }
\ No newline at end of file
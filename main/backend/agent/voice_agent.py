@@ -3,12 +3,25 @@ F1 Race Engineer Voice Agent - Adrian
 Combines championship calculations with RAG over sporting regulations
 """
 
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import wave
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Final, List, Optional, Tuple
+import aiohttp
+from livekit import rtc
 from livekit.agents import (
     Agent,
+    ChatContext,
+    ChatMessage,
     AgentSession,
+    MetricsCollectedEvent,
     RunContext,
     function_tool,
+    metrics,
 )
 from livekit.plugins import openai, silero
 from agent.tools import F1Tools
@@ -17,16 +30,10 @@ from agent.rag_pipeline import F1TechnicalRAG
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-class F1RaceEngineerAgent(Agent):
-    """Adrian - Your F1 Race Engineer AI"""
-
-    def __init__(self, rag_pipeline: F1TechnicalRAG):
-        self.rag_pipeline = rag_pipeline
-        self.f1_tools = F1Tools()
-
-        # Adrian's personality and instructions
-        agent_instructions = """You are Adrian, a veteran Formula 1 race engineer with 15 years of paddock experience.
+# Adrian's personality and instructions
+# Kept byte-identical across sessions: it leads every LLM request, so OpenAI's
+# automatic prompt caching can reuse it (together with the tool schemas)
+_AGENT_INSTRUCTIONS: Final[str] = """You are Adrian, a veteran Formula 1 race engineer with 15 years of paddock experience.
 
 YOUR PERSONALITY:
 - Calm, measured, and professional (like a real race engineer)
@@ -53,8 +60,13 @@ TOOLS YOU HAVE:
 2. calculate_points_swing - For single race points impact
 3. calculate_pit_stop_time_loss - For pit strategy analysis
 4. search_f1_regulations - For FIA regulation queries
+5. search_f1_regulations_multi - For questions covering several regulation topics at once
+
+When discussing regulations (points system, pit lane rules, etc.), use the search_f1_regulations tool. If a question spans several distinct topics, split it into one short query per topic and use search_f1_regulations_multi. Reference specific articles when they appear.
 
-When discussing regulations (points system, pit lane rules, etc.), use the search_f1_regulations tool. Reference specific articles when they appear.
+Calculation tools return compact JSON data. Put the numbers into natural speech; never read out field names or braces.
+
+When a question needs more than one tool (for example a regulation lookup and a calculation), call all of them together in a single step rather than one after another.
 
 CONVERSATION STYLE:
 - Keep responses concise but informative (30-60 seconds of speech)
@@ -65,11 +77,275 @@ CONVERSATION STYLE:
 Remember: You're a race engineer. Be precise, strategic, and always support your analysis with data.
 """
 
+# Default voices per TTS provider (TTS_VOICE overrides)
+DEFAULT_TTS_VOICES = {
+    "openai": "echo",
+    "cartesia": "f786b574-daa5-4673-aa0c-cbe3e8534c02",
+}
+
+# Streaming STT finalizes a transcript after this much trailing silence
+STT_ENDPOINTING_MS = 300
+
+# Conversation history window (chat items, including tool calls and outputs).
+# Once the history passes the limit it is cut back to the window in one step,
+# so the cached prompt prefix only changes every few turns
+MAX_CHAT_ITEMS = 40
+CHAT_WINDOW_ITEMS = 24
+
+# Tool reply when the regulations can't be searched (embeddings API failure)
+_SEARCH_UNAVAILABLE_REPLY = (
+    "The regulations search is unavailable right now. Tell the user you couldn't "
+    "check the regulations and ask them to try again in a moment."
+)
+
+# Regulation context already returned in this session is not sent again;
+# hashes of the most recent blocks are kept
+MAX_PROVIDED_CONTEXTS = 64
+_REPEAT_CONTEXT_REPLY = (
+    "This search returned the same regulation text already provided earlier in this "
+    "conversation. Answer from that earlier result."
+)
+
+# Fixed opening line; rendered once by the main process before the worker
+# starts (render_greeting_audio), then replayed from disk on every session
+_GREETING = (
+    "Adrian here, your race engineer. How can I help today? "
+    "Regulations, championship scenarios, or race strategy?"
+)
+GREETING_CACHE_DIR = "./cache"
+
+# Greeting audio already loaded in this process
+_greeting_audio: Optional[rtc.AudioFrame] = None
+
+
+def load_speech_plugins() -> Dict:
+    """
+    Load the speech plugins shared by every session in a worker process
+
+    Called from the worker's prewarm hook, so VAD model loading and client
+    setup happen before the first participant joins. Providers are chosen with
+    STT_PROVIDER (openai | deepgram) and TTS_PROVIDER (openai | cartesia);
+    the streaming providers are only imported when selected.
+
+    Returns:
+        dict: Shared "stt", "tts" and "vad" plugin instances, plus "tts_voice"
+    """
+    stt_provider = os.getenv("STT_PROVIDER", "openai").lower()
+    if stt_provider not in ("openai", "deepgram"):
+        raise ValueError(f"Unknown STT_PROVIDER: {stt_provider}")
+
+    logger.info("Loading speech plugins (STT: %s)...", stt_provider)
+
+    # Speech-to-Text
+    if stt_provider == "deepgram":
+        from livekit.plugins import deepgram
+
+        # Streams interim transcripts and finalizes on its own endpointing
+        stt = deepgram.STT(
+            model=os.getenv("DEEPGRAM_MODEL", "nova-3"),
+            interim_results=True,
+            endpointing_ms=STT_ENDPOINTING_MS,
+        )
+    else:
+        # OpenAI Whisper
+        stt = openai.STT(model="whisper-1")
+
+    # Text-to-Speech
+    tts, tts_voice = create_tts()
+
+    return {
+        "stt": stt,
+        "tts": tts,
+        "tts_voice": tts_voice,
+        # Voice Activity Detection
+        "vad": silero.VAD.load(),
+    }
+
+
+def create_tts(http_session: Optional[aiohttp.ClientSession] = None) -> Tuple[Any, str]:
+    """
+    Create the TTS plugin selected by TTS_PROVIDER (openai | cartesia)
+
+    Args:
+        http_session: Session for HTTP-based providers; needed outside a job,
+            where LiveKit provides none
+
+    Returns:
+        tuple: TTS plugin and its "provider:voice" identifier
+    """
+    tts_provider = os.getenv("TTS_PROVIDER", "openai").lower()
+    if tts_provider not in DEFAULT_TTS_VOICES:
+        raise ValueError(f"Unknown TTS_PROVIDER: {tts_provider}")
+    voice = os.getenv("TTS_VOICE", DEFAULT_TTS_VOICES[tts_provider])
+
+    logger.info("Loading TTS (%s, voice %s)...", tts_provider, voice)
+
+    if tts_provider == "cartesia":
+        from livekit.plugins import cartesia
+
+        tts = cartesia.TTS(
+            model=os.getenv("CARTESIA_MODEL", "sonic-3"),
+            voice=voice,
+            http_session=http_session,
+        )
+    else:
+        tts = openai.TTS(voice=voice)
+
+    return tts, f"{tts_provider}:{voice}"
+
+
+def create_llm() -> openai.LLM:
+    """
+    Create the session's LLM client
+
+    Defaults to OpenAI gpt-4o-mini. LLM_BASE_URL points it at any
+    OpenAI-compatible endpoint (Groq, Cerebras, a local server, ...) with
+    LLM_MODEL and LLM_API_KEY; LLM_TEMPERATURE overrides the temperature.
+
+    Returns:
+        openai.LLM: Client with parallel tool calls enabled
+    """
+    kwargs = {}
+    if os.getenv("LLM_BASE_URL"):
+        kwargs["base_url"] = os.getenv("LLM_BASE_URL")
+    if os.getenv("LLM_API_KEY"):
+        kwargs["api_key"] = os.getenv("LLM_API_KEY")
+
+    return openai.LLM(
+        model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+        temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
+        parallel_tool_calls=True,
+        **kwargs,
+    )
+
+
+def _greeting_path(voice: str) -> Path:
+    """Cache file of the greeting, keyed by text and voice so editing either re-renders it"""
+    key = hashlib.blake2b(f"{voice}:{_GREETING}".encode(), digest_size=8).hexdigest()
+    return Path(GREETING_CACHE_DIR) / f"greeting_{key}.wav"
+
+
+async def render_greeting_audio():
+    """
+    Render the greeting with the configured TTS and save it, unless already saved
+
+    Run once by the main process before the worker starts, so sessions never
+    synthesize it themselves.
+    """
+    async with aiohttp.ClientSession() as http_session:
+        tts, voice = create_tts(http_session)
+        path = _greeting_path(voice)
+        if path.exists():
+            return
+
+        logger.info("Rendering greeting audio...")
+        async with tts, tts.synthesize(_GREETING) as stream:
+            frames = [audio.frame async for audio in stream]
+    audio = rtc.combine_audio_frames(frames)
+
+    # Written under a per-process name and moved into place, so a reader never
+    # sees a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with wave.open(str(tmp_path), "wb") as f:
+        f.setnchannels(audio.num_channels)
+        f.setsampwidth(2)  # 16-bit PCM
+        f.setframerate(audio.sample_rate)
+        f.writeframes(audio.data.tobytes())
+    tmp_path.replace(path)
+    logger.info("Greeting audio saved to %s", path)
+
+
+def load_greeting_audio(voice: str) -> Optional[rtc.AudioFrame]:
+    """
+    Load the pre-rendered greeting
+
+    Args:
+        voice: Provider and voice of the session's TTS (see create_tts)
+
+    Returns:
+        rtc.AudioFrame: The whole greeting as a single frame, or None if it
+            hasn't been rendered for this voice
+    """
+    global _greeting_audio
+    if _greeting_audio is not None:
+        return _greeting_audio
+
+    path = _greeting_path(voice)
+    if not path.exists():
+        return None
+
+    with wave.open(str(path), "rb") as f:
+        _greeting_audio = rtc.AudioFrame(
+            data=f.readframes(f.getnframes()),
+            sample_rate=f.getframerate(),
+            num_channels=f.getnchannels(),
+            samples_per_channel=f.getnframes(),
+        )
+    return _greeting_audio
+
+
+async def _iter_audio_frames(audio: rtc.AudioFrame, frame_ms: int = 100) -> AsyncIterator[rtc.AudioFrame]:
+    """Replay one long frame as a stream of short frames"""
+    samples = audio.sample_rate * frame_ms // 1000
+    data = audio.data  # int16, interleaved channels
+    step = samples * audio.num_channels
+    for start in range(0, len(data), step):
+        chunk = data[start:start + step]
+        yield rtc.AudioFrame(
+            data=chunk.tobytes(),
+            sample_rate=audio.sample_rate,
+            num_channels=audio.num_channels,
+            samples_per_channel=len(chunk) // audio.num_channels,
+        )
+
+
+def _compact_json(data: Dict) -> str:
+    """Serialize a tool result for the LLM with no extra whitespace"""
+    return json.dumps(data, separators=(",", ":"))
+
+
+class F1RaceEngineerAgent(Agent):
+    """Adrian - Your F1 Race Engineer AI"""
+
+    def __init__(self, rag_pipeline: F1TechnicalRAG):
+        self.rag_pipeline = rag_pipeline
+        self.f1_tools = F1Tools()
+
+        # blake2b digests of regulation context returned this session, oldest first
+        self._provided_contexts: Dict[bytes, None] = {}
+
         # Initialize WITHOUT tools - let decorators handle registration
         super().__init__(
-            instructions=agent_instructions,
+            instructions=_AGENT_INSTRUCTIONS,
         )
 
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
+        """Keep the stored history to a sliding window so per-turn prefill stays bounded"""
+        # The current turn keeps its own copy (leaving a preemptive reply valid);
+        # the shorter history applies from the next turn
+        if len(self.chat_ctx.items) <= MAX_CHAT_ITEMS:
+            return
+
+        chat_ctx = self.chat_ctx.copy()
+        chat_ctx.truncate(max_items=CHAT_WINDOW_ITEMS)  # Keeps the instructions
+        await self.update_chat_ctx(chat_ctx)
+
+        # Earlier search results may have been cut, so they can be sent again
+        self._provided_contexts.clear()
+        logger.info("Chat history trimmed to %d items", len(chat_ctx.items))
+
+    def _is_repeat_context(self, context_info: str) -> bool:
+        """Record a regulation context block; True if this session already received it"""
+        digest = hashlib.blake2b(context_info.encode(), digest_size=16).digest()
+        if digest in self._provided_contexts:
+            return True
+
+        self._provided_contexts[digest] = None
+        if len(self._provided_contexts) > MAX_PROVIDED_CONTEXTS:
+            del self._provided_contexts[next(iter(self._provided_contexts))]
+        return False
+
     @function_tool()
     async def search_f1_regulations(
         self, context: RunContext, query: str
@@ -84,12 +360,20 @@ Remember: You're a race engineer. Be precise, strategic, and always support your
             Relevant information from the FIA regulations
         """
         try:
-            logger.info(f"Searching F1 regulations for: {query}")
+            logger.info("Searching F1 regulations for: %s", query)
+
+            # Use RAG pipeline to get context; runs on a worker thread so the
+            # embedding request doesn't stall the audio pipeline
+            context_info = await asyncio.to_thread(
+                self.rag_pipeline.get_context_for_agent, query
+            )
 
-            # Use RAG pipeline to get context
-            context_info = self.rag_pipeline.get_context_for_agent(query)
+            if context_info is None:
+                return _SEARCH_UNAVAILABLE_REPLY
 
             if context_info and "No relevant information found" not in context_info:
+                if self._is_repeat_context(context_info):
+                    return _REPEAT_CONTEXT_REPLY
                 return f"Based on the FIA F1 Regulations: {context_info}"
             else:
                 return (
@@ -98,7 +382,46 @@ Remember: You're a race engineer. Be precise, strategic, and always support your
                 )
 
         except Exception as e:
-            logger.error(f"Error searching F1 regulations: {e}")
+            logger.error("Error searching F1 regulations: %s", e)
+            return (
+                f"I encountered an error while searching the regulations: {str(e)}. "
+                "Please try rephrasing your question."
+            )
+
+    @function_tool()
+    async def search_f1_regulations_multi(
+        self, context: RunContext, queries: List[str]
+    ) -> str:
+        """
+        Search the FIA F1 regulations for several topics at once.
+
+        Args:
+            queries: One short query per topic, e.g. ["points system", "sprint race format"]
+
+        Returns:
+            Relevant information from the FIA regulations covering all topics
+        """
+        try:
+            logger.info("Searching F1 regulations for: %s", queries)
+
+            # Sub-queries are retrieved concurrently on worker threads
+            context_info = await self.rag_pipeline.get_context_for_agent_batch(queries)
+
+            if context_info is None:
+                return _SEARCH_UNAVAILABLE_REPLY
+
+            if context_info and "No relevant information found" not in context_info:
+                if self._is_repeat_context(context_info):
+                    return _REPEAT_CONTEXT_REPLY
+                return f"Based on the FIA F1 Regulations: {context_info}"
+            else:
+                return (
+                    "I couldn't find specific information about those topics in the current FIA regulations. "
+                    "Could you rephrase your question or ask about a different aspect of F1 regulations?"
+                )
+
+        except Exception as e:
+            logger.error("Error searching F1 regulations: %s", e)
             return (
                 f"I encountered an error while searching the regulations: {str(e)}. "
                 "Please try rephrasing your question."
@@ -123,37 +446,29 @@ Remember: You're a race engineer. Be precise, strategic, and always support your
             sprint_races: Number of sprint races remaining (default 0)
 
         Returns:
-            Championship scenario analysis
+            Championship scenario analysis as compact JSON
         """
         logger.info(
-            f"Championship calculator: D1={driver1_points}, D2={driver2_points}, "
-            f"Races={races_remaining}, Sprints={sprint_races}"
+            "Championship calculator: D1=%s, D2=%s, Races=%s, Sprints=%s",
+            driver1_points, driver2_points, races_remaining, sprint_races
         )
 
         result = self.f1_tools.calculate_championship_scenario(
             driver1_points, driver2_points, races_remaining, sprint_races
         )
 
-        response = (
-            f"Championship Analysis:\n"
-            f"Current gap: {result['current_gap']} points\n"
-            f"Races remaining: {result['races_remaining']}\n"
-            f"Maximum points available: {result['maximum_points_available']}\n\n"
-        )
-
+        response = {
+            "leader": result["leader"],
+            "gap": result["current_gap"],
+            "races_left": result["races_remaining"],
+            "sprints_left": result["sprint_races"],
+            "max_points_available": result["maximum_points_available"],
+            "still_possible": result["mathematically_possible"],
+        }
         if result.get("scenarios"):
-            s0 = result["scenarios"][0]
-            response += (
-                f"{s0['scenario']}: {s0['outcome']}\n"
-                f"{s0['condition']}\n\n"
-            )
+            response["condition"] = result["scenarios"][0]["condition"]
 
-        response += (
-            "The championship is "
-            f"{'still possible' if result['mathematically_possible'] else 'already decided'}."
-        )
-
-        return response
+        return _compact_json(response)
 
     @function_tool()
     async def calculate_points_swing(
@@ -174,11 +489,11 @@ Remember: You're a race engineer. Be precise, strategic, and always support your
             driver2_fastest_lap: Whether driver 2 gets fastest lap point
 
         Returns:
-            Points swing analysis
+            Points swing analysis as compact JSON
         """
         logger.info(
-            f"Points swing: P{driver1_position} "
-            f"(FL={driver1_fastest_lap}) vs P{driver2_position} (FL={driver2_fastest_lap})"
+            "Points swing: P%s (FL=%s) vs P%s (FL=%s)",
+            driver1_position, driver1_fastest_lap, driver2_position, driver2_fastest_lap
         )
 
         result = self.f1_tools.calculate_points_swing(
@@ -188,14 +503,14 @@ Remember: You're a race engineer. Be precise, strategic, and always support your
             driver2_fastest_lap,
         )
 
-        response = (
-            "Points Analysis:\n"
-            f"Driver 1 (P{driver1_position}): {result['driver1_points']} points\n"
-            f"Driver 2 (P{driver2_position}): {result['driver2_points']} points\n"
-            f"Points swing: {abs(result['points_swing'])} points in favor of {result['advantage']}"
-        )
-
-        return response
+        return _compact_json({
+            "d1_pos": driver1_position,
+            "d1_points": result["driver1_points"],
+            "d2_pos": driver2_position,
+            "d2_points": result["driver2_points"],
+            "swing": abs(result["points_swing"]),
+            "advantage": result["advantage"],
+        })
 
     @function_tool()
     async def calculate_pit_stop_time_loss(
@@ -214,26 +529,23 @@ Remember: You're a race engineer. Be precise, strategic, and always support your
             tire_change_seconds: Time for tire change (default 2.5s)
 
         Returns:
-            Pit stop time loss analysis
+            Pit stop time loss analysis as compact JSON
         """
         logger.info(
-            f"Pit stop calc: {pit_lane_length_meters}m @ {pit_lane_speed_limit_kmh}km/h, "
-            f"tire change {tire_change_seconds}s"
+            "Pit stop calc: %sm @ %skm/h, tire change %ss",
+            pit_lane_length_meters, pit_lane_speed_limit_kmh, tire_change_seconds
         )
 
         result = self.f1_tools.calculate_pit_stop_time_loss(
             pit_lane_length_meters, pit_lane_speed_limit_kmh, tire_change_seconds
         )
 
-        response = (
-            "Pit Stop Analysis:\n"
-            f"Pit lane time: {result['pit_lane_time_seconds']} seconds\n"
-            f"Tire change: {result['tire_change_time_seconds']} seconds\n"
-            f"Total pit stop time: {result['total_pit_stop_time']} seconds\n"
-            f"Time lost vs racing: {result['time_loss_vs_racing']} seconds"
-        )
-
-        return response
+        return _compact_json({
+            "pit_lane_s": result["pit_lane_time_seconds"],
+            "tire_change_s": result["tire_change_time_seconds"],
+            "total_s": result["total_pit_stop_time"],
+            "time_lost_s": result["time_loss_vs_racing"],
+        })
 
 
 class VoiceAgent:
@@ -250,18 +562,26 @@ class VoiceAgent:
         try:
             logger.info("Starting F1 Race Engineer agent - Adrian")
 
-            # Create agent session
+            # Create agent session; speech plugins were loaded by the prewarm hook
+            plugins = self.ctx.proc.userdata["speech_plugins"]
             session = AgentSession(
-                # Speech-to-Text - OpenAI Whisper
-                stt=openai.STT(model="whisper-1"),
-                # Large Language Model
-                llm=openai.LLM(model="gpt-4o-mini", temperature=0.7),
-                # Text-to-Speech
-                tts=openai.TTS(voice="echo"),
-                # Voice Activity Detection
-                vad=silero.VAD.load(),
+                stt=plugins["stt"],
+                # Large Language Model (per session); independent tool calls from
+                # one response are executed concurrently by the session
+                llm=create_llm(),
+                tts=plugins["tts"],
+                vad=plugins["vad"],
+                turn_handling={
+                    # Declare the user's turn over sooner after they stop speaking
+                    "endpointing": {"min_delay": 0.3},
+                    # Start the LLM reply and its TTS while the turn is still
+                    # being confirmed; TTS already streams sentence by sentence
+                    "preemptive_generation": {"enabled": True, "preemptive_tts": True},
+                },
             )
 
+            session.on("metrics_collected", self._log_prompt_cache_usage)
+
             # Create the F1 agent
             f1_agent = F1RaceEngineerAgent(self.rag_pipeline)
 
@@ -271,13 +591,19 @@ class VoiceAgent:
                 agent=f1_agent,
             )
 
-            # Initial greeting
-            await session.generate_reply(
-                instructions=(
-                    "Greet the user as Adrian, the F1 Race Engineer, and ask how you can help "
-                    "them with F1 regulations, championship scenarios, or race strategy today."
-                )
-            )
+            # Initial greeting, played from pre-rendered audio (no TTS round-trip);
+            # streamed live TTS if it wasn't rendered at startup
+            try:
+                greeting_audio = load_greeting_audio(plugins["tts_voice"])
+            except Exception as e:
+                logger.warning("Greeting audio unreadable: %s", e)
+                greeting_audio = None
+
+            if greeting_audio is None:
+                logger.warning("Pre-rendered greeting unavailable, using live TTS")
+                await session.say(_GREETING)
+            else:
+                await session.say(_GREETING, audio=_iter_audio_frames(greeting_audio))
 
             logger.info("Voice agent is now active and listening")
 
@@ -285,5 +611,14 @@ class VoiceAgent:
             # The session will close automatically when the room disconnects
 
         except Exception as e:
-            logger.error(f"Error in F1 voice agent: {e}")
-            raise
\ No newline at end of file
+            logger.error("Error in F1 voice agent: %s", e)
+            raise
+
+    @staticmethod
+    def _log_prompt_cache_usage(ev: MetricsCollectedEvent):
+        """Log how much of each LLM prompt was served from OpenAI's prompt cache"""
+        if isinstance(ev.metrics, metrics.LLMMetrics) and ev.metrics.prompt_tokens:
+            logger.info(
+                "LLM prompt tokens: %d (%d cached)",
+                ev.metrics.prompt_tokens, ev.metrics.prompt_cached_tokens
+            )
\ No newline at end of file
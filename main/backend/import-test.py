@@ -3,7 +3,7 @@ from livekit.plugins import openai
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-import chromadb
+import faiss
 import pypdf
 
 print("All dependencies loaded successfully!")
\ No newline at end of file
@@ -3,37 +3,92 @@ F1 Race Engineer - LiveKit Agent Entry Point
 Initializes RAG pipeline and starts the voice agent
 """
 
+import asyncio
 import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from livekit import agents
-from livekit.agents import JobContext, WorkerOptions, cli
+from livekit.agents import JobContext, JobProcess, WorkerOptions, cli
 
-from agent.voice_agent import VoiceAgent
-from agent.rag_pipeline import initialize_rag_pipeline
+from agent.voice_agent import VoiceAgent, load_speech_plugins, render_greeting_audio
+from agent.rag_pipeline import build_vectorstore, initialize_rag_pipeline
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
+# Configure logging; force replaces the default handler the agent modules
+# install on import
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    force=True
 )
 logger = logging.getLogger(__name__)
 
-# Initialize RAG pipeline once at startup (expensive operation)
-logger.info("="*60)
-logger.info("Initializing F1 Race Engineer - Adrian")
-logger.info("="*60)
+# LOG_LEVEL=WARNING drops this app's per-turn log lines in production. Set on
+# our own loggers because the LiveKit CLI resets the root level from
+# --log-level / LIVEKIT_LOG_LEVEL when the worker starts
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.getLogger("agent").setLevel(LOG_LEVEL)
+logger.setLevel(LOG_LEVEL)
 
-try:
-    rag_pipeline = initialize_rag_pipeline()
-    logger.info("RAG pipeline ready")
-except Exception as e:
+def _log_rag_error(e: Exception):
+    """Log a RAG pipeline startup failure with setup hints"""
     logger.error(f"Failed to initialize RAG pipeline: {e}")
     logger.error("Make sure the F1 regulations PDF is in backend/data/")
     logger.error(f"Expected location: backend/data/fia2026.pdf")
-    raise
+
+def build_rag_index():
+    """
+    Build and save the regulations index on first boot (expensive operation)
+    Runs once in the worker's main process before any job process starts,
+    so job processes only ever load the saved index.
+    """
+    logger.info("="*60)
+    logger.info("Initializing F1 Race Engineer - Adrian")
+    logger.info("="*60)
+    
+    try:
+        build_vectorstore()
+    except Exception as e:
+        _log_rag_error(e)
+        raise
+
+def load_rag_pipeline():
+    """
+    Load the RAG pipeline from the saved index
+    Runs on a background thread started by prewarm.
+    
+    Returns:
+        F1TechnicalRAG: Ready-to-query pipeline
+    """
+    try:
+        rag_pipeline = initialize_rag_pipeline(build_if_missing=False)
+        logger.info("RAG pipeline ready")
+        return rag_pipeline
+    except Exception as e:
+        _log_rag_error(e)
+        raise
+
+def prewarm(proc: JobProcess):
+    """
+    Prepare a worker process before it is assigned a job.
+    Loads the VAD model and speech clients so they are ready when a participant joins,
+    and starts loading the RAG pipeline in the background.
+    
+    Args:
+        proc: JobProcess provided by LiveKit
+    """
+    # Not awaited here: it can outlast the process initialization timeout,
+    # and the entrypoint overlaps it with connecting to the room
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-init")
+    proc.userdata["rag_pipeline"] = executor.submit(load_rag_pipeline)
+    executor.shutdown(wait=False)
+    
+    proc.userdata["speech_plugins"] = load_speech_plugins()
+    logger.info("Speech plugins ready")
 
 async def entrypoint(ctx: JobContext):
     """
@@ -45,8 +100,11 @@ async def entrypoint(ctx: JobContext):
     """
     logger.info(f"Agent connecting to room: {ctx.room.name}")
     
-    # Connect to the LiveKit room
-    await ctx.connect()
+    # Connect to the LiveKit room while the RAG pipeline finishes loading
+    _, rag_pipeline = await asyncio.gather(
+        ctx.connect(),
+        asyncio.wrap_future(ctx.proc.userdata["rag_pipeline"])
+    )
     logger.info("Connected to room")
 
     # Wait for the first participant to join
@@ -63,7 +121,22 @@ async def entrypoint(ctx: JobContext):
         logger.error(f"Error running voice agent: {e}")
         raise
 
+# CLI commands that run jobs (and so prewarm); others such as download-files
+# must not trigger a PDF embedding pass
+JOB_COMMANDS = ("start", "dev", "connect", "console")
+
 if __name__ == "__main__":
+    # Job processes load the index in prewarm; building it here first means
+    # idle processes never build it concurrently
+    if len(sys.argv) > 1 and sys.argv[1] in JOB_COMMANDS:
+        build_rag_index()
+        
+        # Best effort: sessions fall back to live TTS for the greeting
+        try:
+            asyncio.run(render_greeting_audio())
+        except Exception as e:
+            logger.warning(f"Could not pre-render greeting audio: {e}")
+    
     logger.info("Starting LiveKit worker...")
     logger.info("Waiting for participants to join...")
     
@@ -71,5 +144,6 @@ if __name__ == "__main__":
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
         )
     )